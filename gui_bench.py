@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+GUI performance benchmarks for SimulationTestBedApp.
+
+The app is driven under a virtual display (Xvfb or the GTK Broadway backend)
+against synthetic fixtures: a fake /var/log/open5gs tree with a large log, a
+fake /etc/open5gs, and stub nr-gnb/nr-ue/nr-cli executables in a fake HOME.
+The app talks to a private node agent, whose PATH puts a stub sudo first, so
+nodes started from the GUI run the stubs.
+Results are written as JSON so runs on different commits can be compared:
+
+    python3 gui_bench.py run -o base.json
+    git checkout other-branch
+    python3 gui_bench.py run -o head.json
+    python3 gui_bench.py compare base.json head.json
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import platform
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+NETWORK_FUNCTIONS = ["amf", "ausf", "bsf", "nrf", "nssf", "pcf", "scp", "smf", "udm", "udr", "upf"]
+# Metrics where a larger number is an improvement; every other metric is a cost
+HIGHER_IS_BETTER = {"feed_throughput_mb_s"}
+# Bump when the fixture layout changes so reused fixture directories are rebuilt
+FIXTURE_VERSION = 3
+# Printed by the stub nodes once their flood of output is done
+FEED_DONE_MARKER = "bench-feed-done"
+
+LOG_MESSAGES = [
+    "INFO: [imsi-999700000000001] Registration complete (../src/amf/gmm-sm.c:2132)",
+    "INFO: InitialUEMessage (../src/amf/ngap-handler.c:401)",
+    "WARNING: [imsi-999700000000002] Unknown UE by SUCI (../src/amf/context.c:1791)",
+    "ERROR: [imsi-999700000000003] Registration reject [7] (../src/amf/nas-path.c:301)",
+    "INFO: [Added] Number of gNBs is now 1 (../src/amf/context.c:1185)",
+    "ERROR: No PFCP association with UPF (../src/smf/pfcp-path.c:212)",
+    "DEBUG: [ue-1] PDU session established [psi:1] (../src/smf/gsm-sm.c:588)",
+]
+
+STUB_NODE = """#!/bin/sh
+# Benchmark stub for {name}: floods BENCH_FEED_MB of output for the feed
+# benchmark, then prints a heartbeat until interrupted
+if [ -n "$BENCH_FEED_MB" ]; then
+    yes "[{name}] [info] heartbeat payload xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx" | head -c $((BENCH_FEED_MB * 1048576))
+    echo
+    echo "{marker}"
+fi
+i=0
+while :; do
+    i=$((i + 1))
+    echo "[$(date +%T)] [{name}] [info] heartbeat $i"
+    sleep 0.1
+done
+"""
+
+STUB_CLI = """#!/bin/sh
+# Benchmark stub for nr-cli: lists one node, then echoes commands
+if [ "$1" = "--dump" ]; then
+    echo "UERANSIM-gnb-999-70-1"
+    exit 0
+fi
+while read -r cmd; do
+    echo "[$1] $cmd: ok"
+done
+"""
+
+STUB_SUDO = """#!/bin/sh
+# Benchmark stub for sudo: run the command unprivileged
+exec "$@"
+"""
+
+
+# --- fixtures ----------------------------------------------------------
+
+def write_log(path, nf, size_bytes):
+    """Write an Open5GS-style log of roughly size_bytes, one minute per block."""
+    lines = []
+    for i in range(20000):
+        msg = LOG_MESSAGES[i % len(LOG_MESSAGES)]
+        lines.append(f"MM/DD HH:MM:{(i * 60 // 20000):02d}.{i % 1000:03d}: [{nf}] {msg}\n")
+    block = "".join(lines).encode()
+    written = minute = 0
+    with open(path, "wb") as f:
+        while written < size_bytes:
+            stamp = time.strftime("%m/%d %H:%M", time.gmtime(1700000000 + minute * 60)).encode()
+            chunk = block.replace(b"MM/DD HH:MM", stamp)[:size_bytes - written]
+            f.write(chunk)
+            written += len(chunk)
+            minute += 1
+
+
+def write_stub(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+    os.chmod(path, 0o755)
+
+
+def make_fixtures(root, log_size_mb):
+    """Create (or reuse) the fixture tree under root and return its paths."""
+    paths = {
+        "log_dir": os.path.join(root, "var/log/open5gs"),
+        "config_dir": os.path.join(root, "etc/open5gs"),
+        "home": os.path.join(root, "home"),
+        "bin": os.path.join(root, "bin"),
+    }
+    stamp = os.path.join(root, "fixtures.json")
+    if os.path.exists(stamp):
+        with open(stamp) as f:
+            if json.load(f) == {"version": FIXTURE_VERSION, "log_size_mb": log_size_mb}:
+                return paths
+
+    for path in paths.values():
+        os.makedirs(path, exist_ok=True)
+    build_dir = os.path.join(paths["home"], "UERANSIM/build")
+    config_dir = os.path.join(paths["home"], "UERANSIM/config")
+    os.makedirs(build_dir, exist_ok=True)
+    os.makedirs(config_dir, exist_ok=True)
+
+    # One GB-scale log for the NF that logs most, small ones for the rest
+    for nf in NETWORK_FUNCTIONS:
+        size = log_size_mb * 1024 * 1024 if nf == "amf" else 256 * 1024
+        write_log(os.path.join(paths["log_dir"], f"{nf}.log"), nf, size)
+        write_log(os.path.join(paths["log_dir"], f"{nf}.log.1"), nf, size // 8)
+        # logrotate compresses from the second rotation on
+        rotated = os.path.join(paths["log_dir"], f"{nf}.log.2")
+        write_log(rotated, nf, size // 8)
+        with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.unlink(rotated)
+        with open(os.path.join(paths["config_dir"], f"{nf}.yaml"), "w") as f:
+            f.write(f"logger:\n  file:\n    path: {paths['log_dir']}/{nf}.log\n{nf}:\n  sbi:\n    server:\n      - address: 127.0.0.5\n")
+    for name in ("gnb", "ue"):
+        with open(os.path.join(config_dir, f"open5gs-{name}.yaml"), "w") as f:
+            f.write("mcc: '999'\nmnc: '70'\n")
+    write_stub(os.path.join(build_dir, "nr-gnb"), STUB_NODE.format(name="gnb", marker=FEED_DONE_MARKER))
+    write_stub(os.path.join(build_dir, "nr-ue"), STUB_NODE.format(name="ue", marker=FEED_DONE_MARKER))
+    write_stub(os.path.join(build_dir, "nr-cli"), STUB_CLI)
+    write_stub(os.path.join(paths["bin"], "sudo"), STUB_SUDO)
+
+    with open(stamp, "w") as f:
+        json.dump({"version": FIXTURE_VERSION, "log_size_mb": log_size_mb}, f)
+    return paths
+
+
+# --- display servers ---------------------------------------------------
+
+def free_display():
+    for n in range(90, 200):
+        if not os.path.exists(f"/tmp/.X11-unix/X{n}") and not os.path.exists(f"/tmp/.X{n}-lock"):
+            return n
+    raise RuntimeError("no free display number")
+
+
+def start_display(backend):
+    """Start a virtual display and return (process, environment overrides)."""
+    n = free_display()
+    if backend == "xvfb":
+        proc = subprocess.Popen(["Xvfb", f":{n}", "-screen", "0", "1280x800x24", "-nolisten", "tcp"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        env = {"DISPLAY": f":{n}", "GDK_BACKEND": "x11"}
+        ready = f"/tmp/.X11-unix/X{n}"
+    else:
+        proc = subprocess.Popen(["broadwayd", f":{n}"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        env = {"GDK_BACKEND": "broadway", "BROADWAY_DISPLAY": f":{n}"}
+        ready = None
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline and proc.poll() is None:
+        if ready is None or os.path.exists(ready):
+            break
+        time.sleep(0.05)
+    else:
+        proc.kill()
+        raise RuntimeError(f"{backend} display server failed to start")
+    if ready is None:
+        time.sleep(0.5)  # broadwayd has no socket file to wait for
+    return proc, env
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=HERE, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# --- worker: runs inside the virtual display ---------------------------
+
+def rss_kb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def worker_main(args):
+    t0 = time.perf_counter()
+    sys.path.insert(0, HERE)
+    import temp
+    from gi.repository import Gtk, GLib
+    from log_archive import discover_log_sets
+
+    # Keep the loop waking up so pump() can check its deadline
+    GLib.timeout_add(50, lambda: True)
+
+    def pump(predicate, timeout=30.0):
+        deadline = time.perf_counter() + timeout
+        while not predicate():
+            if time.perf_counter() > deadline:
+                raise TimeoutError("benchmark step timed out")
+            Gtk.main_iteration_do(True)
+
+    def settle():
+        while Gtk.events_pending():
+            Gtk.main_iteration_do(False)
+
+    def wait_for_frame(window):
+        painted = []
+        clock = window.get_frame_clock()
+        handler = clock.connect("after-paint", lambda *_: painted.append(True))
+        window.queue_draw()
+        pump(lambda: painted)
+        clock.disconnect(handler)
+
+    results = {}
+
+    # Startup: import + construction until the first frame is painted
+    drawn = []
+    app = temp.SimulationTestBedApp()
+    app.connect("draw", lambda *_: drawn.append(True))
+    pump(lambda: drawn)
+    results["startup_ms"] = (time.perf_counter() - t0) * 1000
+    settle()
+
+    # Menu switching: select each sidebar row and wait for the resulting frame
+    samples = []
+    for _ in range(args.rounds):
+        for index in range(len(app.main_menu_items)):
+            start = time.perf_counter()
+            app.listbox.select_row(app.listbox.get_row_at_index(index))
+            wait_for_frame(app)
+            samples.append((time.perf_counter() - start) * 1000)
+    results["menu_switch_median_ms"] = statistics.median(samples)
+    results["menu_switch_p95_ms"] = sorted(samples)[int(len(samples) * 0.95) - 1]
+
+    # Log open: click the big log set until its first lines are on screen.
+    # The oldest segment is gzipped, so this includes a cold chunk-index build.
+    app.listbox.select_row(app.listbox.get_row_at_index(app.main_menu_items.index("5G Core Network")))
+    settle()
+    app.on_core_logs(None)
+    settle()
+    log_set = next(s for s in discover_log_sets(temp.OPEN5GS_LOG_DIR) if s.nf == "amf")
+    start = time.perf_counter()
+    app.on_log_file_clicked(None, log_set)
+    terminal = app.terminals["core_logs_display"]["terminal"]
+    pump(lambda: "[amf]" in (terminal.get_text()[0] or ""))
+    results["log_open_ms"] = (time.perf_counter() - start) * 1000
+    terminal.feed_child(b"\x03")
+    settle()
+
+    # Node output throughput: start the stub gNB from its button. It floods
+    # --feed-mb of output, which travels agent -> socket -> queue_node_output
+    # -> UpdateScheduler -> Vte; the clock stops once the marker it prints
+    # afterwards has been fed and painted. Only bytes that reached the
+    # terminal count; what the app skipped to keep up, and agent reconnects
+    # after falling too far behind, are reported separately.
+    pump(lambda: app.agent)
+    terminal = app.agent_node_terminal("gnb")
+    settle()
+    feed_stats = {"fed": 0, "skipped": 0, "reconnects": 0, "tail": b""}
+    feed = terminal.feed
+    flush_node_output = app.flush_node_output
+    on_agent_connected = app.on_agent_connected
+
+    def watched_feed(data):
+        feed_stats["fed"] += len(data)
+        feed_stats["tail"] = (feed_stats["tail"] + bytes(data))[-64:]
+        feed(data)
+
+    def watched_flush(name, target):
+        feed_stats["skipped"] += app.skipped_output.get(name, 0)
+        flush_node_output(name, target)
+
+    def watched_connected(client, retry):
+        feed_stats["reconnects"] += client is not None
+        return on_agent_connected(client, retry)
+
+    terminal.feed = watched_feed
+    app.flush_node_output = watched_flush
+    app.on_agent_connected = watched_connected
+    start = time.perf_counter()
+    app.toggle_gnb_process(None)
+    pump(lambda: FEED_DONE_MARKER.encode() in feed_stats["tail"], timeout=300)
+    wait_for_frame(app)
+    elapsed = time.perf_counter() - start
+    results["feed_throughput_mb_s"] = feed_stats["fed"] / (1024 * 1024) / elapsed
+    results["feed_skipped_mb"] = feed_stats["skipped"] / (1024 * 1024)
+    results["feed_agent_reconnects"] = feed_stats["reconnects"]
+    app.toggle_gnb_process(None)
+    pump(lambda: not app.gnb_running)
+    del terminal.feed, app.flush_node_output, app.on_agent_connected
+
+    # Memory per tab: RSS growth of the GUI process per extra terminal tab
+    settle()
+    before = rss_kb()
+    for i in range(args.tabs):
+        app.create_terminal_tab(f"bench_tab_{i}", f"Tab {i}")
+        settle()
+    wait_for_frame(app)
+    results["memory_per_tab_kb"] = (rss_kb() - before) / args.tabs
+
+    json.dump(results, sys.stdout)
+    return 0
+
+
+# --- driver ------------------------------------------------------------
+
+def run_main(args):
+    fixtures_root = args.fixtures or tempfile.mkdtemp(prefix="5g-bench-")
+    paths = make_fixtures(fixtures_root, args.log_size_mb)
+    socket_path = os.path.join(fixtures_root, "agent.sock")
+    env = dict(os.environ)
+    env.update({
+        "HOME": paths["home"],
+        "PATH": paths["bin"] + os.pathsep + env.get("PATH", ""),
+        "OPEN5GS_LOG_DIR": paths["log_dir"],
+        "OPEN5GS_CONFIG_DIR": paths["config_dir"],
+        "TESTBED_AGENT_SOCKET": socket_path,
+        # Inherited by the stub nodes the agent starts
+        "BENCH_FEED_MB": str(args.feed_mb),
+        # Fresh log index cache per run so log-open times are comparable
+        "XDG_CACHE_HOME": tempfile.mkdtemp(prefix="cache-", dir=fixtures_root),
+    })
+    # A private agent, so the benchmark never touches a user's running nodes
+    agent = subprocess.Popen([sys.executable, os.path.join(HERE, "node_agent.py"), "--socket", socket_path, "serve"], env=env)
+    display = None
+    try:
+        display, display_env = start_display(args.backend)
+        env.update(display_env)
+        worker = [sys.executable, os.path.abspath(__file__), "worker",
+                  "--rounds", str(args.rounds), "--feed-mb", str(args.feed_mb), "--tabs", str(args.tabs)]
+        proc = subprocess.run(worker, env=env, stdout=subprocess.PIPE, text=True, timeout=args.timeout)
+        if proc.returncode != 0:
+            print(f"benchmark worker failed with status {proc.returncode}", file=sys.stderr)
+            return proc.returncode
+        metrics = json.loads(proc.stdout)
+    finally:
+        agent.send_signal(signal.SIGTERM)
+        agent.wait()
+        if display:
+            display.terminate()
+            display.wait()
+        shutil.rmtree(env["XDG_CACHE_HOME"], ignore_errors=True)
+        if not args.fixtures:
+            shutil.rmtree(fixtures_root, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "backend": args.backend,
+        "python": platform.python_version(),
+        "config": {"log_size_mb": args.log_size_mb, "rounds": args.rounds, "feed_mb": args.feed_mb, "tabs": args.tabs},
+        "metrics": metrics,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
+
+
+def compare_main(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    regressions = 0
+    print(f"{'metric':<24} {'base':>12} {'head':>12} {'change':>9}")
+    for name, old in base["metrics"].items():
+        new = head["metrics"].get(name)
+        if new is None:
+            continue
+        if old:
+            change = (new - old) / old * 100
+        else:
+            change = 0.0 if new == old else math.inf  # e.g. skipped output appearing
+        worse = -change if name in HIGHER_IS_BETTER else change
+        flag = ""
+        if worse > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{name:<24} {old:>12.2f} {new:>12.2f} {change:>+8.1f}%{flag}")
+    return 1 if regressions else 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="SimulationTestBedApp GUI benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="run the benchmarks under a virtual display")
+    p.add_argument("--backend", choices=["xvfb", "broadway"], default="xvfb")
+    p.add_argument("--fixtures", help="fixture directory to create or reuse (default: temporary)")
+    p.add_argument("--log-size-mb", type=int, default=1024, help="size of the large fixture log")
+    p.add_argument("--rounds", type=int, default=10, help="menu switch rounds")
+    p.add_argument("--feed-mb", type=int, default=16, help="output the stub gNB pushes to its terminal")
+    p.add_argument("--tabs", type=int, default=10, help="tabs opened for the memory measurement")
+    p.add_argument("--timeout", type=float, default=600)
+    p.add_argument("-o", "--output", help="write the JSON results to this file")
+
+    p = sub.add_parser("worker", help=argparse.SUPPRESS)
+    p.add_argument("--rounds", type=int, default=10)
+    p.add_argument("--feed-mb", type=int, default=16)
+    p.add_argument("--tabs", type=int, default=10)
+
+    p = sub.add_parser("compare", help="compare two result files")
+    p.add_argument("base")
+    p.add_argument("head")
+    p.add_argument("--threshold", type=float, default=10.0, help="percent change reported as a regression")
+
+    args = parser.parse_args(argv)
+    return {"run": run_main, "worker": worker_main, "compare": compare_main}[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
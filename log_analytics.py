@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Error and event analytics over the Open5GS logs.
+
+A single streaming pass over each log keeps incremental aggregates per NF:
+per-level totals, per-minute counters for errors, warnings, registration
+rejects and PFCP failures (compact uint32 arrays covering RETENTION_MINUTES),
+and the most frequent warning/error messages with numbers and IMSIs masked.
+
+Each file's read position is checkpointed by inode together with the
+aggregates, so a refresh only parses bytes appended since the previous one.
+Rotated plain files keep their inode and therefore their checkpoint; gzip
+rotations are only parsed on the first scan of an NF, since afterwards they
+hold data that was already counted from the live log. With copytruncate the
+rotation is a new file instead: checkpoints also record a hash of the file's
+first HEAD_BYTES, so the copy is recognised by the head it shares with the
+live log and continues from the live log's checkpoint, while the truncated
+live log, whose head changed, starts over.
+
+    python3 log_analytics.py /var/log/open5gs [--json]
+"""
+import array
+import base64
+import collections
+import gzip
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import time
+import zlib
+
+from log_archive import discover_log_sets
+
+STATE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+                         "5g-testbed", "analytics")
+RETENTION_MINUTES = 7 * 24 * 60
+READ_SIZE = 4 * 1024 * 1024
+MAX_MESSAGES = 2000
+HEAD_BYTES = 256
+SPIKE_WINDOW = 60
+SPIKE_SIGMA = 3.0
+SPIKE_MIN_COUNT = 5
+CATEGORIES = ("error", "warning", "registration_reject", "pfcp_failure")
+
+# 10/19 12:34:56.789: [amf] WARNING: message (../src/amf/file.c:123)
+LINE_RE = re.compile(
+    r"^(\d\d/\d\d \d\d:\d\d):\d\d\.\d+: \[[^\]]*\] (FATAL|ERROR|WARNING|INFO|DEBUG|TRACE): (.*)$",
+    re.MULTILINE)
+SOURCE_RE = re.compile(r"\s*\(\.\./src/[^)]*\)\s*$")
+IMSI_RE = re.compile(r"(imsi|suci|supi)-[\w-]+", re.IGNORECASE)
+NUMBER_RE = re.compile(r"\d+")
+REGISTRATION_REJECT_RE = re.compile(r"registration reject", re.IGNORECASE)
+
+
+class MinuteSeries:
+    """Per-minute counters in a uint32 array that starts at epoch minute `base`."""
+
+    def __init__(self, base=None, counts=None):
+        self.base = base
+        self.counts = counts if counts is not None else array.array("I")
+
+    def add(self, minute, n=1):
+        if self.base is None or minute - (self.base + len(self.counts)) > RETENTION_MINUTES:
+            self.base, self.counts = minute, array.array("I")
+        offset = minute - self.base
+        if offset < 0:
+            if -offset > RETENTION_MINUTES:
+                return
+            self.counts[0:0] = array.array("I", bytes(4 * -offset))
+            self.base, offset = minute, 0
+        if offset >= len(self.counts):
+            self.counts.extend(array.array("I", bytes(4 * (offset + 1 - len(self.counts)))))
+        self.counts[offset] += n
+        excess = len(self.counts) - RETENTION_MINUTES
+        if excess > 0:
+            del self.counts[:excess]
+            self.base += excess
+
+    def window(self, end_minute, minutes):
+        """Counts for the `minutes` minutes ending at end_minute, oldest first."""
+        out = [0] * minutes
+        if self.base is None:
+            return out
+        for i in range(minutes):
+            offset = end_minute - minutes + 1 + i - self.base
+            if 0 <= offset < len(self.counts):
+                out[i] = self.counts[offset]
+        return out
+
+    def spikes(self):
+        """Yield (minute, count, baseline) for buckets far above the trailing mean."""
+        total = total_sq = 0
+        for i, count in enumerate(self.counts):
+            if i >= SPIKE_WINDOW:
+                mean = total / SPIKE_WINDOW
+                std = math.sqrt(max(0.0, total_sq / SPIKE_WINDOW - mean * mean))
+                if count >= SPIKE_MIN_COUNT and count > mean + SPIKE_SIGMA * std:
+                    yield self.base + i, count, mean
+                old = self.counts[i - SPIKE_WINDOW]
+                total -= old
+                total_sq -= old * old
+            total += count
+            total_sq += count * count
+
+    def to_json(self):
+        return {"base": self.base, "counts": base64.b64encode(self.counts.tobytes()).decode()}
+
+    @classmethod
+    def from_json(cls, data):
+        counts = array.array("I")
+        counts.frombytes(base64.b64decode(data["counts"]))
+        return cls(data["base"], counts)
+
+
+class NfStats:
+    def __init__(self):
+        self.totals = collections.Counter()
+        self.series = {c: MinuteSeries() for c in CATEGORIES}
+
+    def to_json(self):
+        return {"totals": dict(self.totals), "series": {c: s.to_json() for c, s in self.series.items()}}
+
+    @classmethod
+    def from_json(cls, data):
+        stats = cls()
+        stats.totals.update(data["totals"])
+        stats.series.update({c: MinuteSeries.from_json(s) for c, s in data["series"].items()})
+        return stats
+
+
+class Tally:
+    """Counts from one file, merged into LogAnalytics once the file parsed cleanly."""
+
+    def __init__(self):
+        self.levels = collections.Counter()
+        self.buckets = collections.Counter()  # (category, minute) -> count
+        self.messages = collections.Counter()  # (level, template) -> count
+
+
+def prune_messages(messages):
+    """Keep the heavy hitters; rare messages are dropped and recounted if they recur."""
+    if len(messages) > MAX_MESSAGES:
+        kept = messages.most_common(MAX_MESSAGES // 2)
+        messages.clear()
+        messages.update(dict(kept))
+
+
+def file_head(f, length):
+    """[length, sha1 of the first length bytes of f]"""
+    f.seek(0)
+    return [length, hashlib.sha1(f.read(length)).hexdigest()]
+
+
+def head_matches(f, head):
+    # Checkpoints written before heads were recorded have none; trust them
+    return head is None or file_head(f, head[0]) == head
+
+
+class LogAnalytics:
+    def __init__(self, log_dir, state_path=None):
+        self.log_dir = log_dir
+        digest = hashlib.sha1(os.path.abspath(log_dir).encode()).hexdigest()[:16]
+        self.state_path = state_path or os.path.join(STATE_DIR, f"{digest}.json")
+        self.checkpoints = {}  # "dev-ino" -> {"nf", "path", "offset", "done"}
+        self.nfs = collections.defaultdict(NfStats)
+        self.messages = collections.Counter()  # "nf\tlevel\ttemplate" -> count
+        self.scanned = set()  # NFs whose logs, rotations included, were read once
+        self.errors = []
+        self._minutes = {}
+        self.load()
+
+    # --- persistence ---------------------------------------------------
+
+    def load(self):
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            checkpoints = dict(state["checkpoints"])
+            nfs = {nf: NfStats.from_json(s) for nf, s in state["nfs"].items()}
+            messages = collections.Counter(state["messages"])
+            scanned = set(state.get("scanned", (c["nf"] for c in checkpoints.values())))
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            # Missing, corrupt or from an older layout: start over from scratch
+            return
+        self.checkpoints = checkpoints
+        self.nfs.update(nfs)
+        self.messages = messages
+        self.scanned = scanned
+
+    def save(self):
+        state = {
+            "checkpoints": self.checkpoints,
+            "nfs": {nf: s.to_json() for nf, s in self.nfs.items()},
+            "messages": dict(self.messages),
+            "scanned": sorted(self.scanned),
+        }
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    # --- parsing -------------------------------------------------------
+
+    def refresh(self):
+        """Parse everything appended since the last refresh; returns bytes parsed.
+
+        Each file is parsed into its own tally, which is merged into the
+        aggregates together with the file's new checkpoint only once the whole
+        file was read. A file that fails (e.g. a .gz logrotate is still
+        writing) is listed in self.errors and retried on the next refresh.
+        """
+        parsed = 0
+        seen = set()
+        self.errors = []
+        for log_set in discover_log_sets(self.log_dir):
+            nf = log_set.nf
+            initial_scan = nf not in self.scanned
+            complete = True
+            for segment in log_set.segments:
+                try:
+                    st = os.stat(segment.path)
+                except FileNotFoundError:
+                    continue
+                key = f"{st.st_dev}-{st.st_ino}"
+                seen.add(key)
+                checkpoint = self.checkpoints.get(key) or {"nf": nf, "path": segment.path, "offset": 0, "done": False}
+                checkpoint["path"] = segment.path
+                if checkpoint["done"]:
+                    continue
+                # After the initial scan a new .gz is a compressed copy of a
+                # rotation that was already counted as a plain file
+                if segment.compressed and not initial_scan:
+                    self.checkpoints[key] = dict(checkpoint, done=True)
+                    continue
+                offset, head = checkpoint["offset"], None
+                tally = Tally()
+                try:
+                    if segment.compressed:
+                        with gzip.open(segment.path, "rb") as f:
+                            consumed = self._parse_stream(f, tally, final=True)
+                    else:
+                        with open(segment.path, "rb") as f:
+                            # A changed head means the file was truncated in place
+                            # (copytruncate) or its inode was reused: a new file
+                            if key not in self.checkpoints or st.st_size < offset \
+                                    or not head_matches(f, checkpoint.get("head")):
+                                offset = 0 if initial_scan else self._copied_offset(key, nf, f, st.st_size)
+                            head = file_head(f, min(HEAD_BYTES, st.st_size))
+                            f.seek(offset)
+                            consumed = self._parse_stream(f, tally)
+                except (OSError, EOFError, zlib.error) as e:
+                    self.errors.append(f"{segment.path}: {e}")
+                    complete = False
+                    continue
+                self._apply(nf, tally)
+                self.checkpoints[key] = dict(checkpoint, offset=offset + consumed, done=segment.compressed, head=head)
+                parsed += consumed
+            if complete:
+                self.scanned.add(nf)
+        for key in set(self.checkpoints) - seen:
+            del self.checkpoints[key]
+        self.save()
+        return parsed
+
+    def _copied_offset(self, key, nf, f, size):
+        """A new plain file after the initial scan is a copytruncate copy of
+        a file we follow if their heads match; that file's checkpoint says
+        how much of the copy was counted already."""
+        for other, checkpoint in self.checkpoints.items():
+            if other != key and checkpoint["nf"] == nf and not checkpoint["done"] and checkpoint.get("head") \
+                    and checkpoint["head"][0] and checkpoint["offset"] <= size and head_matches(f, checkpoint["head"]):
+                return checkpoint["offset"]
+        return 0
+
+    def _parse_stream(self, f, tally, final=False):
+        """Parse complete lines from f into tally; returns the bytes consumed.
+        A trailing partial line is left for the next refresh unless final is set."""
+        consumed = 0
+        tail = b""
+        while True:
+            block = f.read(READ_SIZE)
+            if not block:
+                break
+            block = tail + block
+            end = block.rfind(b"\n") + 1
+            tail = block[end:]
+            self._parse_block(block[:end], tally)
+            consumed += end
+        if final and tail:
+            self._parse_block(tail, tally)
+            consumed += len(tail)
+        return consumed
+
+    def _minute(self, stamp):
+        minute = self._minutes.get(stamp)
+        if minute is None:
+            # Open5GS omits the year; assume the most recent one that is not in the future
+            now = time.localtime()
+            month, day = int(stamp[0:2]), int(stamp[3:5])
+            hour, mins = int(stamp[6:8]), int(stamp[9:11])
+            year = now.tm_year - 1 if (month, day) > (now.tm_mon, now.tm_mday + 1) else now.tm_year
+            minute = int(time.mktime((year, month, day, hour, mins, 0, 0, 0, -1))) // 60
+            if len(self._minutes) > 100000:
+                self._minutes.clear()
+            self._minutes[stamp] = minute
+        return minute
+
+    def _parse_block(self, block, tally):
+        # Count raw messages per block first, so each distinct message is
+        # normalised into a template only once
+        levels, buckets = tally.levels, tally.buckets
+        raw_messages = collections.Counter()
+        minute_of = self._minute
+        for m in LINE_RE.finditer(block.decode("utf-8", errors="replace")):
+            stamp, level, message = m.groups()
+            levels[level] += 1
+            if level in ("INFO", "DEBUG", "TRACE"):
+                if "eject" in message and REGISTRATION_REJECT_RE.search(message):
+                    buckets["registration_reject", minute_of(stamp)] += 1
+                continue
+            minute = minute_of(stamp)
+            buckets["warning" if level == "WARNING" else "error", minute] += 1
+            if "eject" in message and REGISTRATION_REJECT_RE.search(message):
+                buckets["registration_reject", minute] += 1
+            if "PFCP" in message:
+                buckets["pfcp_failure", minute] += 1
+            raw_messages[level, message] += 1
+
+        for (level, message), n in raw_messages.items():
+            template = NUMBER_RE.sub("#", IMSI_RE.sub(r"\1-*", SOURCE_RE.sub("", message)))
+            tally.messages[level, template] += n
+        prune_messages(tally.messages)
+
+    def _apply(self, nf, tally):
+        stats = self.nfs[nf]
+        stats.totals.update(tally.levels)
+        for (category, minute), n in sorted(tally.buckets.items(), key=lambda item: item[0][1]):
+            stats.series[category].add(minute, n)
+        for (level, template), n in tally.messages.items():
+            self.messages[f"{nf}\t{level}\t{template}"] += n
+        prune_messages(self.messages)
+
+    # --- reporting -----------------------------------------------------
+
+    def summary(self, minutes=60, top=20, now=None):
+        """Aggregate view for the dashboard: per-NF rows, top messages and spikes."""
+        end = int(now if now is not None else time.time()) // 60
+        rows = []
+        for nf in sorted(self.nfs):
+            stats = self.nfs[nf]
+            errors = stats.series["error"].window(end, minutes)
+            warnings = stats.series["warning"].window(end, minutes)
+            rows.append({
+                "nf": nf,
+                "errors": sum(errors),
+                "warnings": sum(warnings),
+                "errors_per_minute": errors,
+                "total_errors": stats.totals["ERROR"] + stats.totals["FATAL"],
+                "total_warnings": stats.totals["WARNING"],
+                "total_lines": sum(stats.totals.values()),
+            })
+        top_messages = []
+        for key, count in self.messages.most_common(top):
+            nf, level, template = key.split("\t", 2)
+            top_messages.append({"nf": nf, "level": level, "message": template, "count": count})
+        spikes = []
+        for nf, stats in self.nfs.items():
+            for category in ("registration_reject", "pfcp_failure", "error"):
+                for minute, count, baseline in stats.series[category].spikes():
+                    spikes.append({"nf": nf, "category": category, "minute": minute,
+                                   "count": count, "baseline": baseline})
+        spikes.sort(key=lambda s: s["minute"], reverse=True)
+        return {"minutes": minutes, "end_minute": end, "nfs": rows,
+                "top_messages": top_messages, "spikes": spikes[:top]}
+
+
+def sparkline(values):
+    bars = "\u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588"
+    peak = max(values) if values else 0
+    if not peak:
+        return bars[0] * len(values)
+    return "".join(bars[max(1 if v else 0, v * len(bars) // (peak + 1))] for v in values)
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Aggregate Open5GS log errors and events")
+    parser.add_argument("log_dir", nargs="?", default="/var/log/open5gs")
+    parser.add_argument("--minutes", type=int, default=60, help="window for the per-NF counts")
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    analytics = LogAnalytics(args.log_dir)
+    start = time.monotonic()
+    parsed = analytics.refresh()
+    report = analytics.summary(args.minutes)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return 0
+
+    print(f"parsed {parsed / 1e6:.1f} MB in {time.monotonic() - start:.2f}s\n")
+    for error in analytics.errors:
+        print(f"skipped {error}", file=sys.stderr)
+    print(f"{'NF':<8} {'errors':>7} {'warnings':>9} {'total err':>10} {'total warn':>11}  last {args.minutes} min")
+    for row in report["nfs"]:
+        print(f"{row['nf']:<8} {row['errors']:>7} {row['warnings']:>9} {row['total_errors']:>10} "
+              f"{row['total_warnings']:>11}  {sparkline(row['errors_per_minute'])}")
+    print("\nTop messages:")
+    for msg in report["top_messages"]:
+        print(f"{msg['count']:>9}  {msg['nf']:<6} {msg['level']:<8} {msg['message']}")
+    print("\nSpikes:")
+    for spike in report["spikes"]:
+        when = time.strftime("%m/%d %H:%M", time.localtime(spike["minute"] * 60))
+        print(f"  {when}  {spike['nf']:<6} {spike['category']:<20} {spike['count']} (baseline {spike['baseline']:.1f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Rotated and compressed Open5GS log sets.
+
+logrotate leaves each NF's log as a family of files: amf.log, amf.log.1,
+amf.log.2.gz, ... (or amf.log-20240101.gz with dateext). A LogSet groups
+one NF's files oldest first and reads them as one continuous stream.
+
+Gzip files cannot be seeked, so each one is decompressed once, streaming,
+into a chunk cache: the uncompressed data is cut into CHUNK_SIZE pieces
+that are recompressed independently, plus an index mapping uncompressed
+offsets to cached chunks. Seeking anywhere in a week-old archive then only
+inflates one chunk. Indexes are built in parallel over a process pool and
+keyed by inode, so they stay valid when logrotate renames the file. Only the
+files a read actually reaches are indexed: showing the tail of a set that
+fits in the live log never touches its .gz rotations.
+
+    python3 log_archive.py list /var/log/open5gs
+    python3 log_archive.py cat /var/log/open5gs amf [--offset N | --tail BYTES]
+"""
+import bisect
+import gzip
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+                         "5g-testbed", "log-index")
+CHUNK_SIZE = 4 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+CACHE_MAX_AGE = 14 * 24 * 3600
+
+# amf.log, amf.log.1, amf.log.2.gz, amf.log-20240101, amf.log-20240101.gz
+ROTATION_RE = re.compile(r"^(?P<nf>.+?)\.log(?:(?P<sep>[.-])(?P<suffix>\d+))?(?P<gz>\.gz)?$")
+
+
+class LogSegment:
+    """One file of a log set; compressed segments are read through their chunk index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.compressed = path.endswith(".gz")
+        self.index = None
+        self._chunk = (None, b"")  # last inflated chunk: (index, data)
+
+    @property
+    def index_key(self):
+        st = os.stat(self.path)
+        return f"{st.st_dev}-{st.st_ino}-{st.st_size}-{st.st_mtime_ns}"
+
+    @property
+    def size(self):
+        """Uncompressed size; compressed segments must be indexed first."""
+        if self.compressed:
+            return self.index["size"]
+        return os.path.getsize(self.path)
+
+    def load_index(self):
+        self.index = load_index(self.path, self.index_key)
+        return self.index is not None
+
+    def read(self, offset, length):
+        if not self.compressed:
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                return f.read(length)
+        out = []
+        chunks = self.index["chunks"]
+        i = bisect.bisect_right(chunks, [offset, float("inf")]) - 1
+        while length > 0 and i < len(chunks):
+            start = chunks[i][0]
+            data = self._inflate(i)[offset - start:offset - start + length]
+            out.append(data)
+            offset += len(data)
+            length -= len(data)
+            i += 1
+        return b"".join(out)
+
+    def _inflate(self, i):
+        # Sequential reads are smaller than a chunk; keep the last one inflated
+        # so streaming a chunk only decompresses it once
+        if self._chunk[0] != i:
+            _, cache_offset, cache_length = self.index["chunks"][i]
+            with open(cache_path(self.index["key"], ".chunks"), "rb") as f:
+                f.seek(cache_offset)
+                self._chunk = (i, zlib.decompress(f.read(cache_length)))
+        return self._chunk[1]
+
+
+class LogSet:
+    def __init__(self, nf, segments):
+        self.nf = nf
+        self.segments = segments  # oldest first, the live log last
+
+    @property
+    def label(self):
+        rotated = len(self.segments) - 1
+        return f"{self.nf}.log (+{rotated} rotated)" if rotated else f"{self.nf}.log"
+
+    def prepare(self, pool=None, segments=None):
+        """Build missing chunk indexes for segments (default: all), one gzip
+        file per worker process."""
+        segments = self.segments if segments is None else segments
+        pending = [s for s in segments if s.compressed and s.index is None and not s.load_index()]
+        if not pending:
+            return
+        if pool is None and len(pending) == 1:
+            pending[0].index = build_index(pending[0].path)
+        elif pool is None:
+            with ProcessPoolExecutor() as pool:
+                self._build(pool, pending)
+        else:
+            self._build(pool, pending)
+
+    def _build(self, pool, segments):
+        for segment, index in zip(segments, pool.map(build_index, [s.path for s in segments])):
+            segment.index = index
+
+    @property
+    def size(self):
+        """Uncompressed size of the whole set; indexes every .gz segment."""
+        self.prepare()
+        return sum(s.size for s in self.segments)
+
+    def position(self, offset=0, tail=None):
+        """Return (segment number, offset in it) where the stream offset, or
+        the last tail bytes, start. Only the segments walked over are indexed:
+        oldest first up to offset, newest first back to the tail."""
+        if tail is not None:
+            for i in range(len(self.segments) - 1, -1, -1):
+                segment = self.segments[i]
+                self.prepare(segments=[segment])
+                if tail <= segment.size:
+                    return i, segment.size - tail
+                tail -= segment.size
+            return 0, 0
+        for i, segment in enumerate(self.segments):
+            self.prepare(segments=[segment])
+            if offset < segment.size:
+                return i, offset
+            offset -= segment.size
+        return len(self.segments), 0
+
+    def stream(self, offset=0, tail=None):
+        """Yield the set's contents from offset (or the last tail bytes)
+        onwards as one byte stream."""
+        first, offset = self.position(offset, tail)
+        self.prepare(segments=self.segments[first:])
+        for segment in self.segments[first:]:
+            size = segment.size
+            while offset < size:
+                data = segment.read(offset, READ_SIZE)
+                if not data:
+                    break
+                offset += len(data)
+                yield data
+            offset = 0
+
+
+def cache_path(key, ext):
+    return os.path.join(CACHE_DIR, key + ext)
+
+
+def load_index(path, key):
+    try:
+        with open(cache_path(key, ".idx")) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    os.utime(cache_path(key, ".idx"))
+    return index
+
+
+def build_index(path):
+    """Decompress a gzip file once into independently compressed chunks."""
+    key = LogSegment(path).index_key
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    chunks = []
+    size = cache_offset = 0
+    tmp = cache_path(key, f".chunks.{os.getpid()}")
+    with gzip.open(path, "rb") as src, open(tmp, "wb") as dst:
+        while True:
+            data = src.read(CHUNK_SIZE)
+            if not data:
+                break
+            packed = zlib.compress(data, 1)
+            dst.write(packed)
+            chunks.append([size, cache_offset, len(packed)])
+            size += len(data)
+            cache_offset += len(packed)
+    os.replace(tmp, cache_path(key, ".chunks"))
+    index = {"key": key, "source": path, "size": size, "chunk_size": CHUNK_SIZE, "chunks": chunks}
+    with open(cache_path(key, ".idx.tmp"), "w") as f:
+        json.dump(index, f)
+    os.replace(cache_path(key, ".idx.tmp"), cache_path(key, ".idx"))
+    return index
+
+
+def prune_cache(max_age=CACHE_MAX_AGE):
+    """Drop chunk caches whose index has not been used for max_age seconds."""
+    if not os.path.isdir(CACHE_DIR):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(CACHE_DIR):
+        if name.endswith(".idx") and os.path.getmtime(cache_path(name[:-4], ".idx")) < cutoff:
+            for ext in (".idx", ".chunks"):
+                try:
+                    os.unlink(cache_path(name[:-4], ext))
+                except OSError:
+                    pass
+
+
+def rotation_age(match):
+    """Sort key: larger is older. The live log is 0, numbered rotations count up,
+    date suffixes count down towards the past."""
+    if match.group("suffix") is None:
+        return (0, 0)
+    if match.group("sep") == "-":
+        return (1, -int(match.group("suffix")))
+    return (1, int(match.group("suffix")))
+
+
+def discover_log_sets(log_dir):
+    """Group the logs in log_dir into one LogSet per NF, sorted by NF name."""
+    groups = {}
+    if os.path.isdir(log_dir):
+        for name in os.listdir(log_dir):
+            match = ROTATION_RE.match(name)
+            if match and os.path.isfile(os.path.join(log_dir, name)):
+                groups.setdefault(match.group("nf"), []).append((rotation_age(match), name))
+    sets = []
+    for nf in sorted(groups):
+        names = [name for _, name in sorted(groups[nf], reverse=True)]
+        sets.append(LogSet(nf, [LogSegment(os.path.join(log_dir, n)) for n in names]))
+    return sets
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Read rotated Open5GS log sets as one stream")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("list", help="list log sets and their files")
+    p.add_argument("log_dir")
+    p = sub.add_parser("cat", help="stream one NF's logs, oldest first")
+    p.add_argument("log_dir")
+    p.add_argument("nf")
+    where = p.add_mutually_exclusive_group()
+    where.add_argument("--offset", type=int, default=0, help="start at this byte of the stream")
+    where.add_argument("--tail", type=int, help="only show the last TAIL bytes")
+    args = parser.parse_args(argv)
+
+    sets = discover_log_sets(args.log_dir)
+    prune_cache()
+    if args.command == "list":
+        for log_set in sets:
+            print(log_set.label)
+            for segment in log_set.segments:
+                print(f"    {os.path.basename(segment.path)}")
+        return 0
+
+    log_set = next((s for s in sets if s.nf == args.nf), None)
+    if log_set is None:
+        print(f"no logs for '{args.nf}' in {args.log_dir}", file=sys.stderr)
+        return 1
+    out = sys.stdout.buffer
+    try:
+        for data in log_set.stream(args.offset, args.tail):
+            out.write(data)
+        out.flush()
+    except BrokenPipeError:
+        # Reader went away (e.g. piped into head); not an error for a log viewer
+        os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+"""
+Background agent that owns the gNB/UE node processes.
+
+The agent listens on a Unix socket and speaks a JSON-lines protocol: every
+request and every reply/event is one JSON object terminated by a newline.
+Node processes run on their own pty, so they keep running when the GUI is
+closed or crashes, and any number of viewers (the GUI or a headless client)
+can attach to follow their output and resource usage. Stopping a node sends
+SIGINT to its process group, then SIGTERM and SIGKILL if the group is still
+around after STOP_GRACE seconds each. When the agent itself exits it stops
+every node this way and waits for them, so no node outlives its supervisor.
+
+Requests ("op"):
+    {"op": "list"}
+    {"op": "start", "name": "gnb", "argv": [...], "cwd": "..."}
+    {"op": "stop", "name": "gnb"}
+    {"op": "send", "name": "gnb", "data": "status\\n"}
+    {"op": "attach"}        replay buffered output, then stream events
+
+Events ("event"):
+    nodes   -> snapshot of all known nodes
+    output  -> {"name", "data"}
+    metrics -> {"name", "cpu", "rss"}
+    exited  -> {"name", "status"}
+    error   -> {"name", "message"}
+"""
+import collections
+import fcntl
+import json
+import os
+import pty
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+SOCKET_PATH = os.environ.get(
+    "TESTBED_AGENT_SOCKET",
+    os.path.join(os.environ.get("XDG_RUNTIME_DIR", "/tmp"), "5g-testbed-agent.sock"),
+)
+LOG_BUFFER_BYTES = 256 * 1024
+METRICS_INTERVAL = 1.0
+STOP_GRACE = 5.0
+# A viewer whose unsent events pass this size is disconnected; it can reattach
+CLIENT_BUFFER_BYTES = 4 * 1024 * 1024
+CLK_TCK = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def encode_message(msg):
+    return (json.dumps(msg, separators=(",", ":")) + "\n").encode()
+
+
+def field(request, key, kind, required=True):
+    """Return request[key] after checking its type; raises ValueError otherwise."""
+    value = request.get(key)
+    if value is None and not required:
+        return None
+    if not isinstance(value, kind):
+        raise ValueError(f"'{key}' must be a {kind.__name__}")
+    return value
+
+
+def reset_signals():
+    # Runs in the child before exec: a node must not inherit an ignored SIGINT
+    # (e.g. from an agent started with "&" in a script), or stop cannot reach it
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, signal.SIG_DFL)
+
+
+def process_tree(root_pid):
+    """Return root_pid and all of its descendants (sudo forks the real node)."""
+    children = collections.defaultdict(list)
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children[int(fields[1])].append(int(entry))
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, ()))
+    return pids
+
+
+def read_process_usage(pids):
+    """Return (cpu ticks, rss bytes) summed over pids."""
+    ticks = rss = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{pid}/statm") as f:
+                rss += int(f.read().split()[1]) * PAGE_SIZE
+        except (OSError, IndexError):
+            continue
+        ticks += int(fields[11]) + int(fields[12])
+    return ticks, rss
+
+
+class Node:
+    def __init__(self, name, argv, cwd):
+        self.name = name
+        self.argv = argv
+        self.cwd = cwd
+        self.output = collections.deque()
+        self.output_size = 0
+        self.status = None
+        self.cpu = 0.0
+        self.rss = 0
+        self._last_ticks = None
+        self._last_sample = None
+        self._stop_signals = []  # pending escalation: [(deadline, signal)]
+
+        self.master_fd, slave_fd = pty.openpty()
+        try:
+            self.proc = subprocess.Popen(
+                argv, cwd=cwd, stdin=slave_fd, stdout=slave_fd, stderr=slave_fd,
+                start_new_session=True, preexec_fn=reset_signals,
+            )
+        except OSError:
+            os.close(self.master_fd)
+            raise
+        finally:
+            os.close(slave_fd)
+        os.set_blocking(self.master_fd, False)
+
+    @property
+    def running(self):
+        return self.status is None
+
+    def describe(self):
+        return {
+            "name": self.name, "argv": self.argv, "cwd": self.cwd, "pid": self.proc.pid,
+            "running": self.running, "status": self.status, "cpu": self.cpu, "rss": self.rss,
+        }
+
+    def append_output(self, data):
+        self.output.append(data)
+        self.output_size += len(data)
+        while self.output_size > LOG_BUFFER_BYTES and len(self.output) > 1:
+            self.output_size -= len(self.output.popleft())
+
+    def sample(self):
+        now = time.monotonic()
+        ticks, self.rss = read_process_usage(process_tree(self.proc.pid))
+        if self._last_ticks is not None and now > self._last_sample:
+            self.cpu = 100.0 * (ticks - self._last_ticks) / CLK_TCK / (now - self._last_sample)
+        self._last_ticks, self._last_sample = ticks, now
+
+    def stop(self):
+        if not self.running:
+            return
+        if not self._stop_signals:
+            now = time.monotonic()
+            self._stop_signals = [(now + STOP_GRACE, signal.SIGTERM), (now + 2 * STOP_GRACE, signal.SIGKILL)]
+        self._signal(signal.SIGINT)
+
+    def escalate(self, now):
+        """Send the stop signals that are due; returns the next deadline, or
+        None once the process group is gone or SIGKILL has been sent."""
+        while self._stop_signals and self.group_alive():
+            deadline, sig = self._stop_signals[0]
+            if deadline > now:
+                return deadline
+            self._stop_signals.pop(0)
+            self._signal(sig)
+        self._stop_signals = []
+        return None
+
+    def group_alive(self):
+        try:
+            os.killpg(self.proc.pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass  # root-owned members (under sudo) are left
+        return True
+
+    def _signal(self, sig):
+        try:
+            os.killpg(self.proc.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            # Gone already, or only root-owned members (under sudo) are left
+            pass
+
+    def reap(self):
+        self.status = self.proc.wait()
+        os.close(self.master_fd)
+
+
+class Agent:
+    def __init__(self, path=SOCKET_PATH):
+        self.path = path
+        self.nodes = {}
+        self.clients = {}
+        self.selector = selectors.DefaultSelector()
+
+    def serve_forever(self):
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        # The lock is held for the agent's lifetime, so a socket file found
+        # while holding it is stale; a live (or starting) agent keeps its path.
+        self.lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self.lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self.lock_fd)
+            raise RuntimeError(f"an agent is already running on {self.path}")
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        os.chmod(self.path, 0o600)
+        server.listen()
+        server.setblocking(False)
+        self.selector.register(server, selectors.EVENT_READ, self._accept)
+
+        next_sample = time.monotonic() + METRICS_INTERVAL
+        try:
+            while True:
+                now = time.monotonic()
+                deadlines = [d for d in (n.escalate(now) for n in self.nodes.values()) if d is not None]
+                timeout = max(0.0, min([next_sample] + deadlines) - now)
+                for key, mask in self.selector.select(timeout):
+                    key.data(key.fileobj, mask)
+                if time.monotonic() >= next_sample:
+                    self._sample_metrics()
+                    next_sample = time.monotonic() + METRICS_INTERVAL
+        finally:
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)  # let the shutdown finish
+            server.close()
+            self._stop_all()
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    def _stop_all(self):
+        """Stop every node, escalating as usual, and wait until all have exited."""
+        nodes = list(self.nodes.values())
+        for node in nodes:
+            node.stop()
+        give_up = time.monotonic() + 2 * STOP_GRACE + 1.0
+        while time.monotonic() < give_up:
+            now = time.monotonic()
+            waiting = False
+            for node in nodes:
+                if node.running:
+                    try:
+                        os.read(node.master_fd, 65536)  # keep a chatty node from blocking on its pty
+                    except OSError:
+                        pass
+                    if node.proc.poll() is not None:
+                        node.reap()
+                if node.escalate(now) is not None or node.running:
+                    waiting = True
+            if not waiting:
+                return
+            time.sleep(0.05)
+
+    # --- clients -------------------------------------------------------
+
+    def _accept(self, server, mask):
+        conn, _ = server.accept()
+        conn.setblocking(False)
+        self.clients[conn] = {"buffer": b"", "out": bytearray(), "attached": False}
+        self.selector.register(conn, selectors.EVENT_READ, self._on_client)
+
+    def _on_client(self, conn, mask):
+        # The client may have been dropped earlier in this round of events
+        if conn in self.clients and mask & selectors.EVENT_WRITE:
+            self._flush(conn)
+        if conn in self.clients and mask & selectors.EVENT_READ:
+            self._read_client(conn)
+
+    def _drop_client(self, conn):
+        if self.clients.pop(conn, None) is None:
+            return
+        self.selector.unregister(conn)
+        conn.close()
+
+    def _read_client(self, conn):
+        try:
+            data = conn.recv(65536)
+        except ConnectionError:
+            data = b""
+        if not data:
+            self._drop_client(conn)
+            return
+        client = self.clients[conn]
+        client["buffer"] += data
+        *lines, client["buffer"] = client["buffer"].split(b"\n")
+        for line in lines:
+            if conn not in self.clients:
+                return
+            if not line.strip():
+                continue
+            request = {}
+            try:
+                request = json.loads(line)
+                self._handle(conn, request)
+            except Exception as e:
+                # A bad request is the client's problem; the nodes keep running
+                name = request.get("name") if isinstance(request, dict) else None
+                self._send(conn, {"event": "error", "name": name, "message": f"{type(e).__name__}: {e}"})
+
+    def _send(self, conn, msg):
+        # Events are queued per client and written as the socket accepts them,
+        # so a viewer that stops reading never stalls the loop or the nodes.
+        client = self.clients.get(conn)
+        if client is None:
+            return
+        client["out"] += encode_message(msg)
+        if len(client["out"]) > CLIENT_BUFFER_BYTES:
+            self._drop_client(conn)
+            return
+        self._flush(conn)
+
+    def _flush(self, conn):
+        out = self.clients[conn]["out"]
+        try:
+            sent = conn.send(out)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self._drop_client(conn)
+            return
+        del out[:sent]
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if out else 0)
+        if self.selector.get_key(conn).events != events:
+            self.selector.modify(conn, events, self._on_client)
+
+    def _broadcast(self, msg):
+        for conn, client in list(self.clients.items()):
+            if client["attached"]:
+                self._send(conn, msg)
+
+    def _snapshot(self):
+        return {"event": "nodes", "nodes": [n.describe() for n in self.nodes.values()]}
+
+    def _node(self, request):
+        name = field(request, "name", str)
+        if name not in self.nodes:
+            raise ValueError(f"unknown node '{name}'")
+        return self.nodes[name]
+
+    def _handle(self, conn, request):
+        if not isinstance(request, dict):
+            raise ValueError("request must be a JSON object")
+        op = field(request, "op", str)
+        if op == "list":
+            self._send(conn, self._snapshot())
+        elif op == "attach":
+            self.clients[conn]["attached"] = True
+            self._send(conn, self._snapshot())
+            for node in self.nodes.values():
+                if node.output:
+                    data = b"".join(node.output).decode(errors="replace")
+                    self._send(conn, {"event": "output", "name": node.name, "data": data})
+        elif op == "start":
+            name = field(request, "name", str)
+            argv = field(request, "argv", list)
+            if not argv or not all(isinstance(a, str) for a in argv):
+                raise ValueError("'argv' must be a non-empty list of strings")
+            cwd = field(request, "cwd", str, required=False)
+            if name in self.nodes and self.nodes[name].running:
+                raise ValueError(f"node '{name}' is already running")
+            node = Node(name, argv, os.path.expanduser(cwd or "~"))
+            self.nodes[name] = node
+            self.selector.register(node.master_fd, selectors.EVENT_READ,
+                                   lambda fd, mask, node=node: self._read_node(node))
+            self._broadcast(self._snapshot())
+            self._send(conn, {"event": "started", "name": name, "pid": node.proc.pid})
+        elif op == "stop":
+            self._node(request).stop()
+        elif op == "send":
+            node = self._node(request)
+            data = field(request, "data", str)
+            if node.running:
+                os.write(node.master_fd, data.encode())
+        else:
+            raise ValueError(f"unknown op '{op}'")
+
+    # --- nodes ---------------------------------------------------------
+
+    def _read_node(self, node):
+        try:
+            data = os.read(node.master_fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if data:
+            node.append_output(data)
+            self._broadcast({"event": "output", "name": node.name, "data": data.decode(errors="replace")})
+            return
+        self.selector.unregister(node.master_fd)
+        node.reap()
+        self._broadcast({"event": "exited", "name": node.name, "status": node.status})
+
+    def _sample_metrics(self):
+        for node in self.nodes.values():
+            if node.running:
+                node.sample()
+                self._broadcast({"event": "metrics", "name": node.name, "cpu": node.cpu, "rss": node.rss})
+
+
+class AgentClient:
+    """Non-blocking client; the caller polls fileno() and calls read_events()."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self._buffer = b""
+
+    @classmethod
+    def connect(cls, path=SOCKET_PATH):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+        except OSError:
+            sock.close()
+            return None
+        return cls(sock)
+
+    @classmethod
+    def connect_or_spawn(cls, path=SOCKET_PATH, timeout=2.0):
+        """Connect to a running agent, starting a detached one if needed."""
+        client = cls.connect(path)
+        if client:
+            return client
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--socket", path, "serve"],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            client = cls.connect(path)
+            if client:
+                return client
+        return None
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def request(self, op, **fields):
+        fields["op"] = op
+        self.sock.sendall(encode_message(fields))
+
+    def read_events(self):
+        """Return the complete events received so far, or None once the agent is gone."""
+        self.sock.setblocking(False)
+        try:
+            data = self.sock.recv(65536)
+        except BlockingIOError:
+            return []
+        except OSError:
+            data = b""
+        finally:
+            self.sock.setblocking(True)
+        if not data:
+            return None
+        self._buffer += data
+        *lines, self._buffer = self._buffer.split(b"\n")
+        return [json.loads(line) for line in lines if line.strip()]
+
+    def close(self):
+        self.sock.close()
+
+
+def headless_main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="5G test bed node agent")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("serve", help="run the agent in the foreground")
+    sub.add_parser("status", help="list supervised nodes")
+    sub.add_parser("attach", help="stream node output and metrics")
+    p = sub.add_parser("start", help="start a node: start NAME [--cwd DIR] -- ARGV...")
+    p.add_argument("name")
+    p.add_argument("--cwd")
+    p.add_argument("argv", nargs="+")
+    p = sub.add_parser("stop", help="stop a node")
+    p.add_argument("name")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        try:
+            Agent(args.socket).serve_forever()
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            return 1
+        return 0
+
+    client = AgentClient.connect(args.socket)
+    if client is None:
+        print(f"agent not running on {args.socket}", file=sys.stderr)
+        return 1
+    sock = client.sock.makefile("rb")
+    if args.command == "status":
+        client.request("list")
+        for node in json.loads(sock.readline())["nodes"]:
+            state = "running" if node["running"] else f"exited ({node['status']})"
+            print(f"{node['name']:<8} pid={node['pid']:<7} {state:<14} "
+                  f"cpu={node['cpu']:5.1f}% rss={node['rss'] // 1024}K  {' '.join(node['argv'])}")
+    elif args.command == "start":
+        client.request("start", name=args.name, argv=args.argv, cwd=args.cwd)
+        print(sock.readline().decode().strip())
+    elif args.command == "stop":
+        client.request("stop", name=args.name)
+    elif args.command == "attach":
+        client.request("attach")
+        for line in sock:
+            event = json.loads(line)
+            if event["event"] == "output":
+                sys.stdout.write(event["data"])
+            elif event["event"] == "metrics":
+                print(f"[{event['name']}] cpu={event['cpu']:.1f}% rss={event['rss'] // 1024}K", file=sys.stderr)
+            elif event["event"] == "exited":
+                print(f"[{event['name']}] exited with status {event['status']}", file=sys.stderr)
+            sys.stdout.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(headless_main(sys.argv[1:]))
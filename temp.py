@@ -1,11 +1,109 @@
 #!/usr/bin/env python3
-import gi, os, signal
+import gi, os, shlex, signal, sys, threading, time
 gi.require_version("Gtk", "3.0")
 gi.require_version("Vte", "2.91")
 from gi.repository import Gtk, Gdk, Vte, GLib
+from node_agent import AgentClient, LOG_BUFFER_BYTES
+from log_archive import discover_log_sets
+from log_analytics import LogAnalytics, sparkline
+
+# Open5GS locations; overridable so the GUI can be pointed at fixture trees
+OPEN5GS_LOG_DIR = os.environ.get("OPEN5GS_LOG_DIR", "/var/log/open5gs")
+OPEN5GS_CONFIG_DIR = os.environ.get("OPEN5GS_CONFIG_DIR", "/etc/open5gs")
+
+LOG_ARCHIVE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "log_archive.py")
+SCROLLBACK_LINES = 1000
+# Bytes of a log set worth printing: enough to fill the scrollback with
+# Open5GS lines, which rarely exceed 256 bytes
+LOG_TAIL_BYTES = SCROLLBACK_LINES * 256
 
 PLAY_SYMBOL = "\u25B6"  # ▶
 STOP_SYMBOL = "\u25A0"   # ■
+# Node output is fed in slices of this size while the frame budget lasts, so
+# a flush overruns the budget by at most one slice; the rest waits a frame
+NODE_FEED_BYTES = 16 * 1024
+
+# Node processes supervised by the background agent: key -> (tab title, cwd, argv)
+AGENT_NODES = {
+    "gnb": ("gNB Setup", "~/UERANSIM/build", ["sudo", "./nr-gnb", "-c", "../config/open5gs-gnb.yaml"]),
+    "ue": ("UE Setup", "~/UERANSIM/build", ["sudo", "./nr-ue", "-c", "../config/open5gs-ue.yaml"]),
+}
+
+class UpdateScheduler:
+    """
+    Batches UI updates and applies them on frame-clock ticks.
+
+    Producers post(key, callback, *args) instead of calling GLib.idle_add or
+    GLib.timeout_add themselves. Only the latest post per key (usually the
+    widget being updated) is kept, and each frame runs the due callbacks until
+    FRAME_BUDGET_US is spent; whatever is left waits for the next frame.
+    Callbacks with a lot of work (e.g. feeding node output) check time_left()
+    and re-post what they did not get to.
+    """
+    FRAME_BUDGET_US = 8000
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.pending = {}  # key -> (due time in us, callback, args)
+        self.frame_start = None
+        self.tick_id = None
+        self.timeout_id = None
+
+    def post(self, key, callback, *args, delay=0):
+        self.pending[key] = (GLib.get_monotonic_time() + delay * 1000, callback, args)
+        if self.timeout_id:
+            # The new entry may be due before the pending wakeup
+            GLib.source_remove(self.timeout_id)
+            self.timeout_id = None
+        self.schedule()
+
+    def schedule(self):
+        if self.tick_id or self.timeout_id or not self.pending:
+            return
+        wait_ms = (min(due for due, _, _ in self.pending.values()) - GLib.get_monotonic_time()) // 1000
+        if wait_ms <= 0 and self.widget.get_mapped():
+            self.tick_id = self.widget.add_tick_callback(self.on_tick)
+        else:
+            # Sleep until the next deadline; an unmapped window has no frame clock,
+            # so fall back to polling at roughly the frame rate.
+            self.timeout_id = GLib.timeout_add(max(wait_ms, 16), self.on_timeout)
+
+    def time_left(self):
+        """Microseconds left of the running frame's budget, for callbacks that
+        can split their work and re-post the remainder; 0 outside a frame."""
+        if self.frame_start is None:
+            return 0
+        return self.FRAME_BUDGET_US - (GLib.get_monotonic_time() - self.frame_start)
+
+    def run_due(self):
+        start = self.frame_start = GLib.get_monotonic_time()
+        try:
+            for key, entry in list(self.pending.items()):
+                if self.time_left() < 0:
+                    break
+                due, callback, args = entry
+                if due > start or self.pending.get(key) is not entry:
+                    continue
+                del self.pending[key]
+                callback(*args)
+        finally:
+            self.frame_start = None
+        return start
+
+    def on_tick(self, widget, frame_clock):
+        start = self.run_due()
+        if any(due <= start for due, _, _ in self.pending.values()):
+            return GLib.SOURCE_CONTINUE
+        self.tick_id = None
+        self.schedule()
+        return GLib.SOURCE_REMOVE
+
+    def on_timeout(self):
+        self.timeout_id = None
+        if not self.widget.get_mapped():
+            self.run_due()
+        self.schedule()
+        return False
 
 class SimulationTestBedApp(Gtk.Window):
     def __init__(self):
@@ -13,6 +111,9 @@ class SimulationTestBedApp(Gtk.Window):
         self.set_default_size(1000, 700)
         self.setup_css()
         self.terminals = {}
+        self.scheduler = UpdateScheduler(self)
+        self.pending_output = {}  # node -> bytearray, at most LOG_BUFFER_BYTES
+        self.skipped_output = {}  # node -> bytes trimmed from its backlog since the last flush
 
         # Runtime control state
         self.gnb_running = False
@@ -23,6 +124,15 @@ class SimulationTestBedApp(Gtk.Window):
         self.ue_button_ref = None
         self.is_terminal_position_set = False
 
+        # Log analytics are created on first use and refreshed off the UI thread
+        self.analytics = None
+        self.analytics_busy = False
+
+        # Background agent connection; None means nodes run in local terminals
+        self.agent = None
+        self.agent_watch_id = None
+        self.agent_connecting = False
+
         # Main layout
         self.paned = Gtk.Paned(orientation=Gtk.Orientation.HORIZONTAL)
         self.add(self.paned)
@@ -67,6 +177,148 @@ class SimulationTestBedApp(Gtk.Window):
         # Select "Network Overview" by default on startup
         self.listbox.select_row(self.listbox.get_row_at_index(0))
         self.show_all()
+        self.connect_agent()
+
+    def connect_agent(self, retry=False):
+        """Attach to the node agent, starting it if needed. Returns False to stop a retry timer."""
+        # Spawning the agent can take a while, so connect off the UI thread
+        if self.agent or self.agent_connecting:
+            return False
+        self.agent_connecting = True
+
+        def work():
+            client = AgentClient.connect_or_spawn()
+            GLib.idle_add(self.on_agent_connected, client, retry)
+
+        threading.Thread(target=work, daemon=True).start()
+        return False
+
+    def on_agent_connected(self, client, retry):
+        self.agent_connecting = False
+        if client is None:
+            if retry:
+                GLib.timeout_add_seconds(2, self.connect_agent, True)
+            return False
+        # The agent replays its buffered output on attach; start the node
+        # views from scratch so nothing is shown twice after a reconnect
+        for name in AGENT_NODES:
+            self.pending_output.pop(name, None)
+            self.skipped_output.pop(name, None)
+            info = self.terminals.get(name)
+            if info and info.get('agent'):
+                info['terminal'].reset(True, True)
+                info['terminal'].feed(b"\x1b[2J\x1b[H")
+        self.agent = client
+        self.agent.request("attach")
+        self.agent_watch_id = GLib.io_add_watch(
+            self.agent.fileno(), GLib.PRIORITY_DEFAULT,
+            GLib.IO_IN | GLib.IO_HUP | GLib.IO_ERR, self.on_agent_readable)
+        return False
+
+    def on_agent_readable(self, fd, condition):
+        events = self.agent.read_events()
+        if events is None:
+            # Agent went away: fall back to local terminals and try to reattach later
+            self.agent.close()
+            self.agent = None
+            self.agent_watch_id = None
+            GLib.timeout_add_seconds(2, self.connect_agent, True)
+            return False
+        for event in events:
+            self.on_agent_event(event)
+        return True
+
+    def on_agent_event(self, event):
+        kind, name = event["event"], event.get("name")
+        if kind == "nodes":
+            # The snapshot is authoritative for every agent node, including ones
+            # that exited while this GUI was disconnected
+            running = {n["name"] for n in event["nodes"] if n["running"]}
+            for node_name in AGENT_NODES:
+                info = self.terminals.get(node_name)
+                if info and not info.get('agent'):
+                    continue  # started in a local terminal before the agent was reachable
+                if node_name in running:
+                    self.agent_node_terminal(node_name)
+                self.scheduler.post(f"{node_name}_button", self.set_node_running, node_name, node_name in running)
+        elif name not in AGENT_NODES:
+            return
+        elif kind == "output":
+            self.queue_node_output(name, event["data"].encode())
+        elif kind == "metrics":
+            info = self.terminals.get(name)
+            if info:
+                text = f"{AGENT_NODES[name][0]}  |  CPU {event['cpu']:.1f}%  RSS {event['rss'] // (1024 * 1024)} MB"
+                self.scheduler.post(info['label'], info['label'].set_text, text)
+        elif kind == "exited":
+            self.scheduler.post(f"{name}_button", self.set_node_running, name, False)
+        elif kind == "error":
+            self.queue_node_output(name, f"\r\n[agent] {event['message']}\r\n".encode())
+            self.scheduler.post(f"{name}_button", self.set_node_running, name, False)
+
+    def queue_node_output(self, name, data):
+        # Output is accumulated and fed to the terminal in per-frame slices. A
+        # node that outpaces the terminal loses its oldest backlog, like the
+        # agent's replay buffer, cut at a line boundary where possible.
+        # Tabs are only opened for running or user-started nodes, so output
+        # for a node without an agent tab (closed, or long exited) is dropped.
+        info = self.terminals.get(name)
+        if not info or not info.get('agent'):
+            return
+        terminal = info['terminal']
+        pending = self.pending_output.setdefault(name, bytearray())
+        pending += data
+        excess = len(pending) - LOG_BUFFER_BYTES
+        if excess > 0:
+            cut = pending.find(b"\n", excess) + 1 or excess
+            del pending[:cut]
+            self.skipped_output[name] = self.skipped_output.get(name, 0) + cut
+        self.scheduler.post(terminal, self.flush_node_output, name, terminal)
+
+    def flush_node_output(self, name, terminal):
+        pending = self.pending_output.get(name)
+        if not pending:
+            return
+        skipped = self.skipped_output.pop(name, 0)
+        if skipped:
+            terminal.feed(f"\r\n[... {skipped // 1024} KB of output skipped, the terminal could not keep up ...]\r\n".encode())
+        while True:
+            terminal.feed(bytes(pending[:NODE_FEED_BYTES]))
+            del pending[:NODE_FEED_BYTES]
+            if not pending or self.scheduler.time_left() <= 0:
+                break
+        if pending:
+            self.scheduler.post(terminal, self.flush_node_output, name, terminal)
+        else:
+            del self.pending_output[name]
+
+    def agent_node_terminal(self, name):
+        """Terminal tab that only displays agent output and forwards keystrokes to the node."""
+        if name in self.terminals:
+            return self.terminals[name]['terminal']
+        terminal = self.create_terminal_tab(name, AGENT_NODES[name][0], spawn=False)
+        self.terminals[name]['agent'] = True
+        terminal.connect("commit", lambda _, text, size: self.agent and self.agent.request("send", name=name, data=text))
+        return terminal
+
+    def set_node_running(self, name, running):
+        if not running:
+            getattr(self, f"reset_{name}_button")()
+            return
+        setattr(self, f"{name}_running", True)
+        button = getattr(self, f"{name}_button_ref")
+        if button:
+            ctx = button.get_style_context()
+            ctx.remove_class("start-button")
+            ctx.add_class("stop-button")
+            button.set_label(f"{STOP_SYMBOL} Stop")
+
+    def start_agent_node(self, name):
+        _, cwd, argv = AGENT_NODES[name]
+        terminal = self.agent_node_terminal(name)
+        terminal.feed(f"$ cd {cwd} && {' '.join(argv)}\r\n".encode())
+        self.agent.request("start", name=name, argv=argv, cwd=cwd)
+        self.set_node_running(name, True)
 
     def on_content_paned_allocated(self, widget, allocation):
         # This function runs whenever the container is resized.
@@ -193,7 +445,7 @@ class SimulationTestBedApp(Gtk.Window):
         
         # 6. Show all the new widgets and set a default size for the panes
         parent_box.show_all()
-        GLib.idle_add(paned.set_position, 250) # Sets the button area height to 250px
+        self.scheduler.post(paned, paned.set_position, 250) # Sets the button area height to 250px
 
     def show_network_overview(self):
         hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=20)
@@ -209,6 +461,7 @@ class SimulationTestBedApp(Gtk.Window):
             ("Binaries", self.on_core_binaries),
             ("Configuration", self.on_core_config),
             ("Logs", self.on_core_logs),
+            ("Analytics", self.on_core_analytics),
             ("Resource Monitor", self.on_core_monitor)
         ]
         self.add_toolbar_with_content(items, "core_area", "core_buttons")
@@ -224,15 +477,15 @@ class SimulationTestBedApp(Gtk.Window):
     def on_core_daemons(self, _):
         terminal = self.create_terminal_tab("5g_daemons", "5G Daemon Status")
         command = 'systemctl status open5gs-*\n'
-        GLib.timeout_add(300, lambda: terminal.feed_child(command.encode()) or False)
+        self.feed_command_later(terminal, command)
 
     def on_core_binaries(self, _):
         terminal = self.create_terminal_tab("core_bin", "Core Binaries")
         command = 'find /usr/bin -type f -executable -name "open5gs-*"\n'
-        GLib.timeout_add(300, lambda: terminal.feed_child(command.encode()) or False)
+        self.feed_command_later(terminal, command)
 
     def on_core_config(self, _):
-        config_dir = "/etc/open5gs"
+        config_dir = OPEN5GS_CONFIG_DIR
         if os.path.exists(config_dir):
             files = sorted([f for f in os.listdir(config_dir) if f.endswith('.yaml')])
         else:
@@ -256,20 +509,17 @@ class SimulationTestBedApp(Gtk.Window):
         box.show_all()
 
     def on_core_logs(self, _):
-        log_dir = "/var/log/open5gs"
-        if os.path.exists(log_dir):
-            files = sorted([f for f in os.listdir(log_dir) if f.endswith('.log')])
-        else:
-            files = []
-    
+        # One entry per NF; rotated and compressed files are shown as one stream
+        log_sets = discover_log_sets(OPEN5GS_LOG_DIR)
+
         box = self.core_area
         for child in box.get_children(): box.remove(child)
 
         listbox = Gtk.ListBox()
-        for f in files:
+        for log_set in log_sets:
             row = Gtk.ListBoxRow()
-            btn = Gtk.Button(label=f, xalign=0)
-            btn.connect("clicked", self.on_log_file_clicked, f)
+            btn = Gtk.Button(label=log_set.label, xalign=0)
+            btn.connect("clicked", self.on_log_file_clicked, log_set)
             row.add(btn)
             listbox.add(row)
         
@@ -281,15 +531,18 @@ class SimulationTestBedApp(Gtk.Window):
         
     def on_config_file_clicked(self, button, filename):
         terminal = self.create_terminal_tab("config_file_display", "Config file: " + filename)
-        full_path=f"/etc/open5gs/{filename}"
+        full_path = os.path.join(OPEN5GS_CONFIG_DIR, filename)
         command = f'cat {full_path}\n'
-        GLib.timeout_add(300,lambda: terminal.feed_child(command.encode()) or False)
+        self.feed_command_later(terminal, command)
         
-    def on_log_file_clicked(self, button, filename):
-        terminal = self.create_terminal_tab("core_logs_display", "Core Log: " + filename)
-        full_path = f"/var/log/open5gs/{filename}"
-        command = f'cat {full_path}\n'
-        GLib.timeout_add(300, lambda: terminal.feed_child(command.encode()) or False)
+    def on_log_file_clicked(self, button, log_set):
+        terminal = self.create_terminal_tab("core_logs_display", "Core Log: " + log_set.label)
+        # log_archive.py reads .gz rotations through its chunk cache; only the
+        # end of the set is printed since the terminal keeps SCROLLBACK_LINES
+        args = [sys.executable, LOG_ARCHIVE_SCRIPT, "cat", OPEN5GS_LOG_DIR, log_set.nf,
+                "--tail", str(LOG_TAIL_BYTES)]
+        command = " ".join(shlex.quote(a) for a in args) + "\n"
+        self.feed_command_later(terminal, command)
 
     def on_core_monitor(self, _):
         box = self.core_area
@@ -297,6 +550,84 @@ class SimulationTestBedApp(Gtk.Window):
         box.pack_start(Gtk.Label(label="[Core] Resource Monitor details here."), True, True, 0)
         box.show_all()
 
+    def on_core_analytics(self, _):
+        box = self.core_area
+        for c in box.get_children(): box.remove(c)
+
+        header = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+        refresh_btn = Gtk.Button(label="Refresh")
+        refresh_btn.connect("clicked", lambda _: self.refresh_analytics())
+        status = Gtk.Label(label="", xalign=0)
+        header.pack_start(refresh_btn, False, False, 0)
+        header.pack_start(status, True, True, 0)
+        box.pack_start(header, False, False, 0)
+
+        # Three tables: per-NF health, most frequent messages, detected spikes
+        tables = [
+            ("nfs", Gtk.ListStore(str, int, int, int, int, str),
+             ["NF", "Errors (1h)", "Warnings (1h)", "Total errors", "Total warnings", "Errors/min (1h)"]),
+            ("top", Gtk.ListStore(int, str, str, str), ["Count", "NF", "Level", "Message"]),
+            ("spikes", Gtk.ListStore(str, str, str, int, str), ["When", "NF", "Event", "Count", "Baseline/min"]),
+        ]
+        self.analytics_view = {"status": status}
+        for name, store, titles in tables:
+            tree = Gtk.TreeView(model=store)
+            for i, title in enumerate(titles):
+                tree.append_column(Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=i))
+            scrolled_window = Gtk.ScrolledWindow()
+            scrolled_window.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+            scrolled_window.add(tree)
+            box.pack_start(scrolled_window, True, True, 0)
+            self.analytics_view[name] = store
+        box.show_all()
+        self.refresh_analytics()
+
+    def refresh_analytics(self):
+        # Parsing runs in a worker thread; only bytes appended since the last
+        # refresh are read, and the result is handed back to the UI scheduler.
+        if self.analytics_busy:
+            return
+        self.analytics_busy = True
+        view = self.analytics_view
+        view["status"].set_text("Refreshing...")
+
+        def work():
+            # Whatever happens, show_analytics must run to clear analytics_busy
+            report, text = None, "Refresh failed"
+            try:
+                if self.analytics is None:
+                    self.analytics = LogAnalytics(OPEN5GS_LOG_DIR)
+                start = time.monotonic()
+                parsed = self.analytics.refresh()
+                report = self.analytics.summary()
+                text = f"Parsed {parsed / 1e6:.1f} MB in {time.monotonic() - start:.1f}s, updated {time.strftime('%H:%M:%S')}"
+                if self.analytics.errors:
+                    text += f", skipped {len(self.analytics.errors)} unreadable file(s): {self.analytics.errors[0]}"
+            except Exception as e:
+                text = f"Refresh failed: {type(e).__name__}: {e}"
+            finally:
+                GLib.idle_add(lambda: self.scheduler.post(view["status"], self.show_analytics, view, report, text))
+
+        threading.Thread(target=work, daemon=True).start()
+
+    def show_analytics(self, view, report, text):
+        self.analytics_busy = False
+        view["status"].set_text(text)
+        if report is None:
+            return
+        view["nfs"].clear()
+        for row in report["nfs"]:
+            view["nfs"].append([row["nf"], row["errors"], row["warnings"], row["total_errors"],
+                                row["total_warnings"], sparkline(row["errors_per_minute"])])
+        view["top"].clear()
+        for msg in report["top_messages"]:
+            view["top"].append([msg["count"], msg["nf"], msg["level"], msg["message"]])
+        view["spikes"].clear()
+        for spike in report["spikes"]:
+            when = time.strftime("%m/%d %H:%M", time.localtime(spike["minute"] * 60))
+            view["spikes"].append([when, spike["nf"], spike["category"].replace("_", " "),
+                                   spike["count"], f"{spike['baseline']:.1f}"])
+
     def on_gnb_binaries(self, _):
         # Placeholder for gNB control UI (if different from Network Overview)
         box = self.gnb_area
@@ -332,20 +663,17 @@ class SimulationTestBedApp(Gtk.Window):
         self.send_commands_sequentially(terminal, commands)
 
     def on_gnb_logs(self, _):
-        log_dir = "/var/log/open5gs"
-        if os.path.exists(log_dir):
-            files = sorted([f for f in os.listdir(log_dir) if f.endswith('.log')])
-        else:
-            files = []
-        
-        box = self.core_area
+        # One entry per NF; rotated and compressed files are shown as one stream
+        log_sets = discover_log_sets(OPEN5GS_LOG_DIR)
+
+        box = self.gnb_area
         for child in box.get_children(): box.remove(child)
 
         listbox = Gtk.ListBox()
-        for f in files:
+        for log_set in log_sets:
             row = Gtk.ListBoxRow()
-            btn = Gtk.Button(label=f, xalign=0)
-            btn.connect("clicked", self.on_log_file_clicked, f)
+            btn = Gtk.Button(label=log_set.label, xalign=0)
+            btn.connect("clicked", self.on_log_file_clicked, log_set)
             row.add(btn)
             listbox.add(row)
         
@@ -461,20 +789,17 @@ class SimulationTestBedApp(Gtk.Window):
         self.send_commands_sequentially(terminal, commands)
 
     def on_ue_logs(self, _):
-        log_dir = "/var/log/open5gs"
-        if os.path.exists(log_dir):
-            files = sorted([f for f in os.listdir(log_dir) if f.endswith('.log')])
-        else:
-            files = []
-        
-        box = self.core_area
+        # One entry per NF; rotated and compressed files are shown as one stream
+        log_sets = discover_log_sets(OPEN5GS_LOG_DIR)
+
+        box = self.ue_area
         for child in box.get_children(): box.remove(child)
 
         listbox = Gtk.ListBox()
-        for f in files:
+        for log_set in log_sets:
             row = Gtk.ListBoxRow()
-            btn = Gtk.Button(label=f, xalign=0)
-            btn.connect("clicked", self.on_log_file_clicked, f)
+            btn = Gtk.Button(label=log_set.label, xalign=0)
+            btn.connect("clicked", self.on_log_file_clicked, log_set)
             row.add(btn)
             listbox.add(row)
         
@@ -612,14 +937,14 @@ class SimulationTestBedApp(Gtk.Window):
 
     def on_gnb_terminated(self, terminal, status):
         """Signal handler for when the gNB terminal process exits."""
-        # Use GLib.idle_add to safely update the UI from a signal handler
-        GLib.idle_add(self.reset_gnb_button)
+        # Defer to the scheduler to safely update the UI from a signal handler
+        self.scheduler.post("gnb_button", self.reset_gnb_button)
 
     def on_ue_terminated(self, terminal, status):
         """Signal handler for when the UE terminal process exits."""
-        GLib.idle_add(self.reset_ue_button)
+        self.scheduler.post("ue_button", self.reset_ue_button)
         
-    def create_terminal_tab(self, key, title):
+    def create_terminal_tab(self, key, title, spawn=True):
         # Part 1: Get or create the terminal and its frame
         if key in self.terminals:
             terminal_info = self.terminals[key]
@@ -638,11 +963,15 @@ class SimulationTestBedApp(Gtk.Window):
             header.pack_start(btn_close, False, False, 0)
 
             terminal = Vte.Terminal()
-            terminal.set_scrollback_lines(1000)
-            terminal.spawn_async(Vte.PtyFlags.DEFAULT, os.environ['HOME'], ["/bin/bash"], [], GLib.SpawnFlags.DEFAULT, None, None, -1, None, None)
+            terminal.set_scrollback_lines(SCROLLBACK_LINES)
+            if spawn:
+                terminal.spawn_async(Vte.PtyFlags.DEFAULT, os.environ['HOME'], ["/bin/bash"], [], GLib.SpawnFlags.DEFAULT, None, None, -1, None, None)
 
             def close_tab(_):
-                if key in ("gnb", "ue"):
+                if key in ("gnb", "ue") and not spawn:
+                    if self.agent:
+                        self.agent.request("stop", name=key)
+                elif key in ("gnb", "ue"):
                     terminal.feed_child(b'\x03')
                 page = self.terminal_notebook.page_num(frame)
                 if page != -1:
@@ -654,6 +983,7 @@ class SimulationTestBedApp(Gtk.Window):
                     self.reset_ue_button()
                     self.ue_terminal_ref = None
                 self.terminals.pop(key, None)
+                self.pending_output.pop(key, None)
 
             btn_close.connect("clicked", close_tab)
             vbox.pack_start(header, False, False, 0)
@@ -661,7 +991,7 @@ class SimulationTestBedApp(Gtk.Window):
             frame.add(vbox)
             self.terminal_notebook.append_page(frame, Gtk.Label(label=title))
             self.terminal_notebook.set_current_page(-1)
-            self.terminals[key] = {'frame': frame, 'terminal': terminal}
+            self.terminals[key] = {'frame': frame, 'terminal': terminal, 'label': lbl}
         
         # Part 2: Shared logic that runs for both new and existing tabs
         self.terminal_notebook.show_all()
@@ -686,17 +1016,34 @@ class SimulationTestBedApp(Gtk.Window):
     def start_5g_terminal(self, _):
         self.on_core_daemons(_)
 
+    def feed_command_later(self, terminal, command, delay=300):
+        # Give the freshly spawned shell time to start; a newer command for the
+        # same terminal replaces one that has not been typed yet.
+        self.scheduler.post((terminal, "command"), terminal.feed_child, command.encode(), delay=delay)
+
     def send_commands_sequentially(self, terminal, commands, delay=1000):
+        # Starting a new sequence on a terminal drops the rest of an unfinished one
         def type_next_command(idx):
             if idx >= len(commands):
-                return False
+                return
             terminal.feed_child((commands[idx] + "\n").encode())
-            GLib.timeout_add(delay, type_next_command, idx + 1)
-            return False
+            self.scheduler.post((terminal, "sequence"), type_next_command, idx + 1, delay=delay)
         type_next_command(0)
 
+    def node_in_local_tab(self, name):
+        """True if the node's tab is a local shell, started while the agent was unreachable."""
+        info = self.terminals.get(name)
+        return bool(info) and not info.get('agent')
+
     def toggle_gnb_process(self, _):
-        if not self.gnb_running:
+        # A node started in a local terminal is unknown to the agent; it keeps
+        # the local start/Ctrl-C path until its tab is closed
+        if self.agent and not self.node_in_local_tab("gnb"):
+            if self.gnb_running:
+                self.agent.request("stop", name="gnb")
+            else:
+                self.start_agent_node("gnb")
+        elif not self.gnb_running:
             terminal = self.create_terminal_tab("gnb", "gNB Setup")
             
             # --- NEW: Connect the signal to our handler ---
@@ -722,7 +1069,12 @@ class SimulationTestBedApp(Gtk.Window):
             self.reset_gnb_button()
 
     def toggle_ue_process(self, _):
-        if not self.ue_running:
+        if self.agent and not self.node_in_local_tab("ue"):
+            if self.ue_running:
+                self.agent.request("stop", name="ue")
+            else:
+                self.start_agent_node("ue")
+        elif not self.ue_running:
             terminal = self.create_terminal_tab("ue", "UE Setup")
 
             # --- NEW: Connect the signal to our handler ---